@@ -4,8 +4,10 @@
 # dependencies = [
 #     "beem",
 #     "hiveengine",
+#     "orjson",
 #     "python-dotenv",
 #     "prettytable",
+#     "requests",
 # ]
 # ///
 """
@@ -18,21 +20,49 @@ Requires environment variables:
 - ACTIVE_WIF: Active key for token transfers
 - POSTING_WIF: Posting key for blockchain interactions
 """
+import csv
+import json
 import logging
-import math
 import os
+import random
+import shelve
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional, Tuple 
+from datetime import datetime, timezone
+from fractions import Fraction
+from itertools import takewhile
+from operator import attrgetter
+from typing import IO, Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple 
 
+import orjson
+import requests
 from beem import Hive
+from beem.blockchain import Blockchain
+from beem.transactionbuilder import TransactionBuilder
 from beem.wallet import Wallet
+from beemapi.exceptions import (
+    CallRetriesReached,
+    NumRetriesReached,
+    RPCConnection,
+    RPCErrorDoRetry,
+    TimeoutException,
+    UnhandledRPCError,
+    UnknownTransaction,
+    WorkingNodeMissing,
+)
+from beemapi.graphenerpc import set_session_instance as set_beem_session_instance
+from beembase.operations import Custom_json
 from dotenv import load_dotenv
 from hiveengine.api import Api
+from hiveengine.exceptions import InsufficientTokenAmount, TokenDoesNotExists, TokenNotInWallet
+from hiveengine.rpc import RPCError, set_session_instance
+from hiveengine.rpc import RPCErrorDoRetry as EngineRPCErrorDoRetry
 from hiveengine.tokenobject import Token
 from hiveengine.wallet import Wallet as HiveEngineWallet
 from prettytable import PrettyTable, TableStyle
+from requests.adapters import HTTPAdapter
 
 # Configure logging
 logging.basicConfig(
@@ -41,40 +71,213 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _json_loads(text: str) -> object:
+    """Parse JSON with orjson, falling back to json for non-strict payloads.
+
+    Used for the replies to BatchApi.rpc_batch, which carry the richlist pages.
+    """
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Hive Engine replies may carry raw control characters inside strings
+        return json.loads(text, strict=False)
+
+# Payments are tracked as integer ten-thousandths of a token
+AMOUNT_SCALE = 10_000
+
+# Maximum number of rows the Hive Engine find RPC returns per call
+PAGE_SIZE = 1000
+
+# Broadcast failures worth retrying, as opposed to rejected transactions
+RETRYABLE_ERRORS = (
+    CallRetriesReached,
+    NumRetriesReached,
+    RPCConnection,
+    RPCErrorDoRetry,
+    TimeoutException,
+    WorkingNodeMissing,
+    requests.exceptions.RequestException,
+)
+
+# Longest wait between broadcast attempts, including one a node asks for via Retry-After
+MAX_RETRY_DELAY = 30
+
+# Upper bound on calls per JSON-RPC batch, so one reply never grows unreasonably large
+MAX_RPC_BATCH = 50
+
+# Hive produces a block every three seconds; broadcast transactions expire
+# after 30 seconds, so by the confirmation timeout each is included or dropped
+HIVE_BLOCK_INTERVAL = 3
+CONFIRMATION_TIMEOUT = 45
+
+# Hive rejects transactions larger than 64 KiB; keep room for the header and signature
+MAX_TRANSACTION_BYTES = 64 * 1024 - 1024
+
+# Serialized size of a transfer custom_json apart from its recipient, amount, symbol and memo
+TRANSFER_OP_OVERHEAD = 192
+
+# Audit CSV column order; rows are written as tuples in this order
+AUDIT_FIELDS = ["account", "balance", "payment", "status", "transaction_id", "tx_timestamp"]
+
+@dataclass(slots=True, frozen=True)
 class TokenConfig:
     """Configuration settings for token distribution."""
     payout_rate: float
+    payout_rate_num: int
+    payout_rate_den: int
     token_query: str
     token_name: str
-    blacklisted_accounts: List[str]
+    blacklisted_accounts: FrozenSet[str]
     node_urls: List[str]
     hive_engine_api_url: str
     nobroadcast: bool
+    batch_size: int
+    tx_per_block: int
+    cache_dir: str
+    cache_ttl: int
+    cache_blocks: int
+    audit_file: str
+    max_retries: int
+
+    def __post_init__(self):
+        """Reject settings that would stall the payout run."""
+        for name in ("tx_per_block", "max_retries"):
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name.upper()} must be at least 1")
 
     @classmethod
     def from_env(cls) -> 'TokenConfig':
         """Create configuration from environment variables with defaults."""
+        get = os.environ.get
+        # Parsed exactly from its decimal string, so payments never inherit float error
+        payout_rate = Fraction(get('PAYOUT_RATE', '0.250'))
         return cls(
-            payout_rate=float(os.getenv('PAYOUT_RATE', '0.250')),
-            token_query=os.getenv('TOKEN_QUERY', 'ARCHONM'),
-            token_name=os.getenv('TOKEN_NAME', 'ARCHON'),
-            blacklisted_accounts=os.getenv('BLACKLISTED_ACCOUNTS', 'ufm.pay,upfundme').split(','),
-            node_urls=[os.getenv('NODE_URL', 'https://api.hive.blog')],
-            hive_engine_api_url=os.getenv('HIVE_ENGINE_API_URL', 'https://api.hive-engine.com/rpc/'),
-            nobroadcast=os.getenv('DRY_RUN', '').lower() in ('true', '1', 'yes')
+            payout_rate=float(payout_rate),
+            payout_rate_num=payout_rate.numerator,
+            payout_rate_den=payout_rate.denominator,
+            token_query=get('TOKEN_QUERY', 'ARCHONM'),
+            token_name=get('TOKEN_NAME', 'ARCHON'),
+            blacklisted_accounts=frozenset(
+                account.strip()
+                for account in get('BLACKLISTED_ACCOUNTS', 'ufm.pay,upfundme').split(',')
+                if account.strip()
+            ),
+            node_urls=[get('NODE_URL', 'https://api.hive.blog')],
+            hive_engine_api_url=get('HIVE_ENGINE_API_URL', 'https://api.hive-engine.com/rpc/'),
+            nobroadcast=get('DRY_RUN', '').lower() in ('true', '1', 'yes'),
+            batch_size=int(get('BATCH_SIZE', '25')),
+            tx_per_block=int(get('TX_PER_BLOCK', '5')),
+            cache_dir=get('CACHE_DIR', '.mining_arc_cache'),
+            cache_ttl=int(get('RICHLIST_CACHE_TTL', '0')),
+            cache_blocks=int(get('RICHLIST_CACHE_BLOCKS', '1200')),
+            audit_file=get(
+                'AUDIT_FILE', f"transaction_audit_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+            ),
+            max_retries=int(get('MAX_RETRIES', '5'))
         )
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TokenHolder:
-    """Represents a token holder with their balance."""
+    """Represents a token holder with their balance and payment."""
     account: str
-    balance: float
+    balance: int
+    payment: int
+
+def format_amount(units: int) -> str:
+    """Format an amount in ten-thousandths of a token as a decimal string."""
+    return f"{units // AMOUNT_SCALE}.{units % AMOUNT_SCALE:04d}"
+
+def parse_amount(text: str) -> int:
+    """Parse a decimal token amount into ten-thousandths of a token, rounding down."""
+    whole, _, fraction = text.partition(".")
+    return int(whole or 0) * AMOUNT_SCALE + int((fraction + "0000")[:4])
+
+def format_quantity(units: int, precision: int) -> str:
+    """Format an amount in ten-thousandths of a token with ``precision`` decimals, rounding down."""
+    whole, fraction = divmod(units, AMOUNT_SCALE)
+    if precision == 0:
+        return str(whole)
+    return f"{whole}.{(f'{fraction:04d}' + '0' * precision)[:precision]}"
+
+def _expiration_time(signed_tx: dict) -> float:
+    """Return the Unix time at which a signed Hive transaction expires."""
+    expiration = datetime.strptime(signed_tx["expiration"], "%Y-%m-%dT%H:%M:%S")
+    return expiration.replace(tzinfo=timezone.utc).timestamp()
+
+def _sidechain_errors(info: dict) -> list:
+    """Return the errors Hive Engine logged while executing a transaction.
+
+    Raises ValueError if the logs cannot be read.
+    """
+    logs = info.get("logs") or {}
+    if isinstance(logs, str):
+        logs = _json_loads(logs)
+    if not isinstance(logs, dict):
+        raise ValueError(f"unexpected transaction logs {logs!r}")
+    return logs.get("errors") or []
+
+class BatchApi(Api):
+    """Hive Engine API client that can send several calls in one JSON-RPC batch."""
+
+    def rpc_batch(self, calls: List[Tuple[str, dict]], endpoint: str = "contracts") -> list:
+        """Send ``(method, params)`` calls as JSON-RPC batches and return results in order.
+
+        Requests are posted directly rather than through the RPC client's
+        shared request queue, so batches may be sent from several threads.
+        """
+        results = []
+        for start in range(0, len(calls), MAX_RPC_BATCH):
+            payload = [
+                {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+                for request_id, (method, params) in enumerate(calls[start:start + MAX_RPC_BATCH])
+            ]
+            text = self.rpc.request_send(endpoint, json.dumps(payload).encode("utf8"))
+            try:
+                reply = _json_loads(text)
+            except ValueError:
+                # Gateways answer overload and outages with HTML error pages
+                self.rpc._check_for_server_error(text)
+            if isinstance(reply, dict):
+                # A malformed batch is answered with a single error object
+                reply = [reply]
+            if not isinstance(reply, list):
+                raise RPCError("Client returned invalid format. Expected JSON!")
+            for response in reply:
+                if isinstance(response, dict) and "error" in response:
+                    error = response["error"]
+                    if isinstance(error, dict):
+                        error = error.get("detail") or error.get("message")
+                    raise RPCError(error)
+            if len(reply) != len(payload):
+                raise RPCError(f"Expected {len(payload)} replies to a batch, got {len(reply)}")
+            results.extend(
+                response.get("result") for response in sorted(reply, key=lambda r: r.get("id", -1))
+            )
+        return results
 
-    @property
-    def payment_amount(self, config: TokenConfig) -> float:
-        """Calculate payment amount based on balance and payout rate."""
-        return self.balance * config.payout_rate
+class TokenBucket:
+    """Token-bucket rate limiter."""
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        """Initialize a full bucket holding ``capacity`` tokens."""
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def acquire(self) -> None:
+        """Wait until a token is available, then consume it."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.refill_per_sec
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.refill_per_sec)
 
 class TokenDistributor:
     """Handles token distribution operations."""
@@ -84,20 +287,67 @@ class TokenDistributor:
         load_dotenv()
         self.config = TokenConfig.from_env()
         self._validate_environment()
-        self.hive_instance, self.hive_wallet = self._initialize_blockchain()
+        # Transfers are signed with this key directly, skipping beem's per-transaction signer lookup
+        self._active_wif = os.environ["ACTIVE_WIF"]
+        self.api = self._create_api()
+        # main() fetches the richlist on its own thread while connect() uses self.api,
+        # so the richlist gets a separate client on the same pooled session
+        self.richlist_api = BatchApi(url=self.config.hive_engine_api_url)
+        self.hive_instance: Optional[Hive] = None
+        self.blockchain: Optional[Blockchain] = None
+        self.hive_wallet: Optional[HiveEngineWallet] = None
+        self.payout_token: Optional[Token] = None
+        self._precision: Optional[int] = None
+        # Everything in the memo after the amount, so each memo is a single concatenation
+        self._memo_suffix = (
+            f" = {self.config.payout_rate} {self.config.token_name} "
+            f"per whole {self.config.token_query} mining share"
+        )
+
+    def connect(self) -> None:
+        """Connect to the Hive blockchain and load the payout token.
+
+        The token lookup only needs Hive Engine, so it runs alongside the Hive
+        node handshake; it goes through rpc_batch, which is safe to call from
+        another thread while the wallet uses the RPC client's request queue.
+        """
+        symbol = self.config.token_name.upper()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            token_future = executor.submit(self.api.rpc_batch, [
+                ("findOne", {"contract": "tokens", "table": "tokens", "query": {"symbol": symbol}})
+            ])
+            self.hive_instance, self.hive_wallet = self._initialize_blockchain()
+            self.blockchain = Blockchain(blockchain_instance=self.hive_instance)
+            token_info = token_future.result()[0]
+        if not token_info:
+            raise TokenDoesNotExists(f"Token {symbol} does not exist")
+        self.payout_token = Token(token_info, api=self.api)
+        self._precision = self.payout_token["precision"]
 
     def _validate_environment(self) -> None:
         """Validate required environment variables are present."""
         required_vars = ['ACTIVE_WIF', 'POSTING_WIF']
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         if missing_vars:
-            logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+            logger.error("Missing required environment variables: %s", ", ".join(missing_vars))
             sys.exit(1)
 
+    def _create_api(self) -> BatchApi:
+        """Create the shared Hive Engine API client and pooled keep-alive session.
+
+        The same session is handed to beem, so Hive node and Hive Engine
+        requests draw from one connection pool.
+        """
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        set_session_instance(session)
+        set_beem_session_instance(session)
+        return BatchApi(url=self.config.hive_engine_api_url)
+
     def _initialize_blockchain(self) -> Tuple[Hive, HiveEngineWallet]:
         """Initialize blockchain connections."""
         try:
-            active_wif = os.environ["ACTIVE_WIF"]
+            active_wif = self._active_wif
             posting_wif = os.environ["POSTING_WIF"]
 
             if self.config.nobroadcast:
@@ -106,101 +356,603 @@ class TokenDistributor:
             hive_instance = Hive(
                 node=self.config.node_urls,
                 keys=[posting_wif, active_wif],
-                nobroadcast=self.config.nobroadcast
+                nobroadcast=self.config.nobroadcast,
+                # Broadcast without waiting for block inclusion; see confirm_transactions
+                blocking=False
             )
 
             wallet = Wallet(blockchain_instance=hive_instance)
             sender_account = wallet.getAccountFromPrivateKey(active_wif)
 
-            api = Api(url=self.config.hive_engine_api_url)
             hive_wallet = HiveEngineWallet(
                 sender_account,
                 blockchain_instance=hive_instance,
-                api=api
+                api=self.api
             )
 
             return hive_instance, hive_wallet
 
         except Exception as e:
-            logger.error(f"Failed to initialize blockchain connections: {e}")
+            logger.error("Failed to initialize blockchain connections: %s", e)
             sys.exit(1)
 
+    def _fetch_pages(self, offsets: Iterable[int]) -> List[List[dict]]:
+        """Fetch pages of holder balances of at least one whole token in one batch."""
+        # Balances are stored as decimal strings, so the string comparison
+        # against "1" lets the node drop every holder with less than one token
+        query = {"symbol": self.config.token_query.upper(), "balance": {"$gte": "1"}}
+        calls = [
+            ("find", {
+                "contract": "tokens",
+                "table": "balances",
+                "query": query,
+                "limit": PAGE_SIZE,
+                "offset": offset,
+                # A stable order, so each offset means the same row across round trips
+                "indexes": [{"index": "_id", "descending": False}]
+            })
+            for offset in offsets
+        ]
+        return [page or [] for page in self.richlist_api.rpc_batch(calls)]
+
+    def _fetch_balances(self) -> List[Tuple[str, int]]:
+        """Fetch whole-token balances of all holders with a positive balance.
+
+        The first page is fetched alone, since most richlists fit in it. Each
+        further JSON-RPC batch asks for twice as many pages as the previous one
+        until a short page shows the end of the richlist, so a richlist of P
+        pages takes about log2(P) + 1 sequential round trips. Past
+        MAX_RPC_BATCH pages per batch the growth becomes linear.
+
+        A holder crossing the one-token threshold between round trips shifts
+        later rows by one, so only the first row seen for an account is kept.
+        """
+        pages = self._fetch_pages([0])
+        width = 1
+        while len(pages[-1]) == PAGE_SIZE:
+            width = min(width * 2, MAX_RPC_BATCH)
+            offset = len(pages) * PAGE_SIZE
+            pages.extend(self._fetch_pages(range(offset, offset + width * PAGE_SIZE, PAGE_SIZE)))
+
+        balances = {}
+        for page in pages:
+            for holder in page:
+                account = holder["account"]
+                if account in balances:
+                    continue
+                # Truncating the decimal string at the point floors the balance
+                balance = int(holder["balance"].partition(".")[0])
+                if balance > 0:
+                    balances[account] = balance
+        return list(balances.items())
+
+    def _cache_key(self) -> str:
+        """Return the richlist cache key for the configured token."""
+        return f"rich:{self.config.token_query}"
+
+    def _cached_balances(self) -> List[Tuple[str, int]]:
+        """Return holder balances from the on-disk cache, fetching them on a miss.
+
+        An entry is reused until its TTL expires or ``cache_blocks`` Hive Engine
+        blocks have passed since the block it was written at.
+        """
+        latest = self.richlist_api.rpc_batch(
+            [("getLatestBlockInfo", {})], endpoint="blockchain"
+        )[0]
+        block = latest["blockNumber"]
+        key = self._cache_key()
+        now = time.time()
+
+        os.makedirs(self.config.cache_dir, exist_ok=True)
+        with shelve.open(os.path.join(self.config.cache_dir, "richlist")) as cache:
+            entry = cache.get(key)
+            if (
+                entry is not None
+                and entry["expires"] > now
+                and block - entry["block"] < self.config.cache_blocks
+            ):
+                logger.info("Using cached richlist for %s", self.config.token_query)
+                return entry["balances"]
+
+            balances = self._fetch_balances()
+            for stale_key in [k for k, v in cache.items() if v["expires"] <= now]:
+                del cache[stale_key]
+            cache[key] = {
+                "expires": now + self.config.cache_ttl,
+                "block": block,
+                "balances": balances,
+            }
+            return balances
+
+    def _invalidate_richlist_cache(self) -> None:
+        """Drop the cached richlist once a payout has been made from it."""
+        if self.config.cache_ttl <= 0:
+            return
+        path = os.path.join(self.config.cache_dir, "richlist")
+        try:
+            with shelve.open(path) as cache:
+                cache.pop(self._cache_key(), None)
+        except OSError as error:
+            logger.warning("Could not invalidate richlist cache %s: %s", path, error)
+
     def get_richlist(self) -> List[TokenHolder]:
-        """Retrieve and filter token holder richlist."""
+        """Retrieve and filter token holder richlist, largest holdings first."""
         try:
-            api = Api(url=self.config.hive_engine_api_url)
-            token = Token(self.config.token_query, api=api)
-            richlist = token.get_holder()
+            if self.config.cache_ttl > 0:
+                balances = self._cached_balances()
+            else:
+                balances = self._fetch_balances()
 
+            blacklist = self.config.blacklisted_accounts
+            # Payments are truncated to whole ten-thousandths of a token
+            rate_num = self.config.payout_rate_num * AMOUNT_SCALE
+            rate_den = self.config.payout_rate_den
             holders = [
                 TokenHolder(
-                    account=holder["account"],
-                    balance=math.floor(float(holder["balance"]))
-                )
-                for holder in richlist
-                if (
-                    math.floor(float(holder["balance"])) > 0
-                    and holder["account"] not in self.config.blacklisted_accounts
+                    account=account,
+                    balance=balance,
+                    payment=balance * rate_num // rate_den
                 )
+                for account, balance in balances
+                if account not in blacklist
             ]
+            holders.sort(key=attrgetter("balance"), reverse=True)
 
-            logger.info(f"Retrieved richlist with {len(holders)} accounts")
+            logger.info("Retrieved richlist with %d accounts", len(holders))
             return holders
 
         except Exception as e:
-            logger.error(f"Error retrieving richlist: {e}")
+            logger.error("Error retrieving richlist: %s", e)
             return []
 
-    def send_transaction(self, recipient: str, amount: float) -> Optional[dict]:
-        """Send token transaction to a recipient."""
+    def _transfer_op(
+        self, recipient: str, amount: str, quantity: str, symbol: str, sender: str
+    ) -> Custom_json:
+        """Build a Hive Engine token transfer operation for a recipient."""
+        json_data = {
+            "contractName": "tokens",
+            "contractAction": "transfer",
+            "contractPayload": {
+                "symbol": symbol,
+                "to": recipient,
+                "quantity": quantity,
+                "memo": amount + self._memo_suffix
+            }
+        }
+        return Custom_json(
+            required_auths=[sender],
+            required_posting_auths=[],
+            id=self.hive_wallet.ssc_id,
+            json=json_data,
+            prefix=self.hive_instance.prefix
+        )
+
+    def _batches(self, holders: Iterable[TokenHolder]) -> Iterator[List[TokenHolder]]:
+        """Group holders into batches that fit in a single Hive transaction.
+
+        A batch holds at most ``batch_size`` transfers and stays under the
+        Hive transaction size limit, whichever is reached first.
+        """
+        op_overhead = (
+            TRANSFER_OP_OVERHEAD + len(self.config.token_name) + len(self._memo_suffix)
+        )
+        batch: List[TokenHolder] = []
+        batch_bytes = 0
+        for holder in holders:
+            # The amount appears twice: as the quantity and in the memo
+            op_bytes = op_overhead + len(holder.account) + 2 * len(format_amount(holder.payment))
+            if batch and (
+                len(batch) >= self.config.batch_size
+                or batch_bytes + op_bytes > MAX_TRANSACTION_BYTES
+            ):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(holder)
+            batch_bytes += op_bytes
+        if batch:
+            yield batch
+
+    def _broadcast(self, signed_tx: dict) -> dict:
+        """Broadcast a signed transaction, retrying transient failures with backoff.
+
+        The same signed transaction is re-sent on every attempt, so a retry can
+        never pay a recipient twice. Retries stop before the transaction expires,
+        since after that a node rejects it whether or not an earlier attempt landed.
+        """
+        expires = _expiration_time(signed_tx)
+        for attempt in range(self.config.max_retries):
+            try:
+                return self.hive_instance.broadcast(signed_tx)
+            except UnhandledRPCError as error:
+                # An earlier attempt reached the node even though its reply was lost
+                if attempt > 0 and "duplicate" in str(error).lower():
+                    return dict(signed_tx)
+                raise
+            except RETRYABLE_ERRORS as error:
+                delay = min(MAX_RETRY_DELAY, 2 ** attempt + random.random())
+                response = getattr(error, "response", None)
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                if retry_after and retry_after.isdigit():
+                    delay = min(MAX_RETRY_DELAY, max(delay, int(retry_after)))
+                if attempt == self.config.max_retries - 1 or time.time() + delay >= expires:
+                    raise
+                logger.warning("Broadcast failed (%s), retrying in %.1fs", error, delay)
+                time.sleep(delay)
+
+    def sign_transaction(self, batch: List[TokenHolder]) -> Optional[Tuple[str, dict]]:
+        """Build and sign one transaction paying every holder in a batch.
+
+        Returns the transaction id and the signed transaction, or None on error.
+        """
         try:
-            logger.info(f"Sending {amount} {self.config.token_name} to {recipient}")
-            transaction = self.hive_wallet.transfer(
-                recipient,
-                amount,
-                self.config.token_name,
-                f"{amount} = {self.config.payout_rate} {self.config.token_name} "
-                f"per whole {self.config.token_query} mining share"
-            )
-            logger.debug(f"Transaction details: {transaction}")
-            return transaction
+            token_name = self.config.token_name
+            symbol = token_name.upper()
+            sender = self.hive_wallet.account
+            precision = self._precision
+            info_enabled = logger.isEnabledFor(logging.INFO)
+            tx = TransactionBuilder(blockchain_instance=self.hive_instance)
+            for holder in batch:
+                amount = format_amount(holder.payment)
+                if info_enabled:
+                    logger.info("Sending %s %s to %s", amount, token_name, holder.account)
+                quantity = format_quantity(holder.payment, precision)
+                tx.appendOps(self._transfer_op(holder.account, amount, quantity, symbol, sender))
+            tx.appendWif(self._active_wif)
+            signed = tx.sign()
+            return signed.id, tx.json()
         except Exception as error:
-            logger.warning(f"Transaction error for {recipient}: {error}")
+            logger.warning(
+                "Signing error for %s: %s", ", ".join(holder.account for holder in batch), error
+            )
             return None
 
+    def _reached_block(self, trx_id: str, signed_tx: dict) -> bool:
+        """Wait until a transaction has expired, then report whether it is in a block."""
+        delay = _expiration_time(signed_tx) + HIVE_BLOCK_INTERVAL - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            self.blockchain.get_transaction(trx_id)
+        except UnknownTransaction:
+            return False
+        except Exception as error:
+            # Recording a possibly included transaction as failed could pay its holders twice
+            logger.warning("Could not look up transaction %s: %s", trx_id, error)
+        return True
+
+    def send_transaction(self, trx_id: str, signed_tx: dict) -> Optional[dict]:
+        """Broadcast a signed transaction.
+
+        If broadcasting fails, the transaction is only reported as failed once a
+        lookup after its expiration shows no attempt made it into a block.
+        """
+        try:
+            transaction = self._broadcast(signed_tx)
+        except Exception as error:
+            if not self._reached_block(trx_id, signed_tx):
+                logger.warning("Transaction error for %s: %s", trx_id, error)
+                return None
+            logger.warning("Transaction %s may have been included despite: %s", trx_id, error)
+            transaction = dict(signed_tx)
+        transaction["trx_id"] = trx_id
+        logger.debug("Transaction details: %s", transaction)
+        return transaction
+
+    def _write_audit(
+        self,
+        writer: Any,
+        batch: List[TokenHolder],
+        transaction: Optional[dict]
+    ) -> None:
+        """Write one audit record per holder in a sent batch."""
+        if transaction is None:
+            status = "Failed"
+        elif self.config.nobroadcast:
+            status = "Dry Run"
+        else:
+            status = "Success"
+        transaction_id = transaction.get("trx_id", "") if transaction else ""
+        tx_timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        writer.writerows(
+            (
+                holder.account,
+                holder.balance,
+                format_amount(holder.payment),
+                status,
+                transaction_id,
+                tx_timestamp,
+            )
+            for holder in batch
+        )
+
+    def _write_outcomes(
+        self,
+        writer: Any,
+        sent: Dict[str, List[TokenHolder]],
+        outcomes: Dict[str, str]
+    ) -> None:
+        """Append a record of the confirmation outcome of each resolved transfer."""
+        tx_timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        writer.writerows(
+            (
+                holder.account,
+                holder.balance,
+                format_amount(holder.payment),
+                outcomes[holder.account],
+                trx_id,
+                tx_timestamp,
+            )
+            for trx_id, batch in sent.items()
+            for holder in batch
+            if holder.account in outcomes
+        )
+
+    def _audit_state(self) -> Tuple[FrozenSet[str], Dict[str, List[TokenHolder]]]:
+        """Read an existing audit log for resuming a run.
+
+        Returns the accounts whose latest record is Confirmed, and the batches
+        of transactions that were broadcast (Success) but never resolved.
+        """
+        latest = {}
+        batches: Dict[str, List[TokenHolder]] = {}
+        try:
+            with open(self.config.audit_file, newline="") as audit_file:
+                for row in csv.DictReader(audit_file):
+                    latest[row["account"]] = (row["status"], row["transaction_id"])
+                    if row["status"] == "Success":
+                        batches.setdefault(row["transaction_id"], []).append(TokenHolder(
+                            account=row["account"],
+                            balance=int(row["balance"]),
+                            payment=parse_amount(row["payment"])
+                        ))
+        except FileNotFoundError:
+            return frozenset(), {}
+        paid = frozenset(
+            account for account, (status, _) in latest.items() if status == "Confirmed"
+        )
+        pending = {
+            trx_id: batches[trx_id]
+            for status, trx_id in latest.values()
+            if status == "Success"
+        }
+        return paid, pending
+
+    def _check_balance(self, holders: List[TokenHolder], min_payment: int) -> None:
+        """Raise if the sender's payout token balance cannot cover every transfer."""
+        symbol = self.config.token_name.upper()
+        token = self.hive_wallet.get_token(symbol)
+        if token is None:
+            raise TokenNotInWallet(f"{symbol} is not in wallet")
+        # Transfers round down to the token precision, i.e. to whole multiples of min_payment
+        total = sum(holder.payment - holder.payment % min_payment for holder in holders)
+        available = parse_amount(token["balance"])
+        if total > available:
+            raise InsufficientTokenAmount(
+                f"Payments total {format_amount(total)} {symbol} "
+                f"but only {format_amount(available)} is in wallet"
+            )
+
     def process_payments(self, holders: List[TokenHolder]) -> None:
-        """Process and distribute token payments."""
-        for holder in holders:
-            payment_amount = holder.balance * self.config.payout_rate
-            if payment_amount > 0.0:
-                self.send_transaction(holder.account, payment_amount)
-                time.sleep(1)  # Rate limiting
+        """Process and distribute token payments in batched transactions.
+
+        Holders whose payment rounds to zero at the payout token's precision
+        are skipped, and nothing is sent unless the sender can cover the rest.
+        If the audit file already exists the run resumes from it: transactions
+        it left unresolved are confirmed first, accounts whose transfer was
+        confirmed or may still execute are skipped, and records are appended.
+        """
+        paid, pending = self._audit_state()
+        with open(self.config.audit_file, "a", newline="") as audit_file:
+            writer = csv.writer(audit_file)
+            if audit_file.tell() == 0:
+                writer.writerow(AUDIT_FIELDS)
+
+            skipped = set(paid)
+            if pending:
+                logger.info(
+                    "Checking %d unresolved transactions from %s",
+                    len(pending), self.config.audit_file
+                )
+                outcomes = self.confirm_transactions(pending)
+                self._write_outcomes(writer, pending, outcomes)
+                audit_file.flush()
+                # Unresolved transfers may yet execute, so only failed ones are sent again
+                skipped.update(
+                    holder.account for batch in pending.values() for holder in batch
+                    if outcomes.get(holder.account) in (None, "Confirmed")
+                )
+            if skipped:
+                logger.info(
+                    "Resuming from %s, skipping %d paid or unresolved accounts",
+                    self.config.audit_file, len(skipped)
+                )
+                holders = [holder for holder in holders if holder.account not in skipped]
+
+            # Smallest payment that is still a nonzero transfer at the token precision
+            min_payment = AMOUNT_SCALE // 10 ** min(self._precision, 4)
+            # Holders are sorted by balance, so the first payment below it ends the payable run
+            payable = list(takewhile(lambda holder: holder.payment >= min_payment, holders))
+            if len(payable) < len(holders):
+                logger.info(
+                    "Skipping %d holders whose payment rounds to zero %s",
+                    len(holders) - len(payable), self.config.token_name
+                )
+            if payable:
+                self._check_balance(payable, min_payment)
+
+            sent = self._send_batches(payable, writer, audit_file)
+            if sent and not self.config.nobroadcast:
+                # Balances read before a payout are not reused for the next one
+                self._invalidate_richlist_cache()
+            self._write_outcomes(writer, sent, self.confirm_transactions(sent))
+        logger.info("Audit log written to %s", self.config.audit_file)
+
+    def _executed_transfers(
+        self, sent: Dict[str, List[TokenHolder]]
+    ) -> Dict[str, List[dict]]:
+        """Return Hive Engine's record of each transfer, for transactions it has processed.
+
+        Hive Engine gives each operation of a multi-operation transaction the
+        id ``<trx_id>-<index>``, so records come back in transfer order.
+        """
+        op_ids = [
+            (trx_id, trx_id if len(batch) == 1 else f"{trx_id}-{index}")
+            for trx_id, batch in sent.items()
+            for index in range(len(batch))
+        ]
+        if not op_ids:
+            return {}
+        infos = self.api.rpc_batch(
+            [("getTransactionInfo", {"txid": op_id}) for _, op_id in op_ids],
+            endpoint="blockchain"
+        )
+        records: Dict[str, List[Optional[dict]]] = {}
+        for (trx_id, _), info in zip(op_ids, infos):
+            records.setdefault(trx_id, []).append(info)
+        # The operations of one transaction are processed in the same sidechain block
+        return {trx_id: infos for trx_id, infos in records.items() if all(infos)}
+
+    def confirm_transactions(self, sent: Dict[str, List[TokenHolder]]) -> Dict[str, str]:
+        """Wait for broadcast transfers to be executed by Hive Engine.
+
+        Returns the outcome for each account that could be resolved:
+        "Confirmed" once Hive Engine executed its transfer, "Rejected" if Hive
+        Engine logged an error for it, and "Unconfirmed" if its transaction
+        never reached a Hive block. Accounts still unresolved at the timeout
+        are left out.
+        """
+        if self.config.nobroadcast or not sent:
+            return {}
+        outcomes: Dict[str, str] = {}
+        pending = dict(sent)
+        unseen = set(sent)  # Not found in a Hive block yet
+        hive_lookups = True
+        deadline = time.monotonic() + CONFIRMATION_TIMEOUT
+        while pending and time.monotonic() < deadline:
+            time.sleep(HIVE_BLOCK_INTERVAL)
+            if hive_lookups:
+                for trx_id in list(unseen):
+                    try:
+                        self.blockchain.get_transaction(trx_id)
+                    except UnknownTransaction:
+                        continue
+                    except Exception as error:
+                        logger.warning(
+                            "Hive transaction lookups failed, checking Hive Engine only: %s", error
+                        )
+                        hive_lookups = False
+                        break
+                    unseen.discard(trx_id)
+
+            in_blocks = {
+                trx_id: batch for trx_id, batch in pending.items()
+                if not hive_lookups or trx_id not in unseen
+            }
+            try:
+                executed = self._executed_transfers(in_blocks)
+            except (
+                RPCError, EngineRPCErrorDoRetry, requests.exceptions.RequestException, ValueError
+            ) as error:
+                logger.warning("Hive Engine transaction lookup failed: %s", error)
+                continue
+            for trx_id, infos in executed.items():
+                # A Hive Engine record means the transaction reached a block
+                unseen.discard(trx_id)
+                try:
+                    transfer_errors = [_sidechain_errors(info) for info in infos]
+                except ValueError as error:
+                    # Left pending, so one bad record cannot discard the outcomes of the rest
+                    logger.warning("Unreadable Hive Engine result for %s: %s", trx_id, error)
+                    continue
+                for holder, errors in zip(pending.pop(trx_id), transfer_errors):
+                    if errors:
+                        outcomes[holder.account] = "Rejected"
+                        logger.warning(
+                            "Hive Engine rejected the transfer to %s: %s", holder.account, errors
+                        )
+                    else:
+                        outcomes[holder.account] = "Confirmed"
+
+        for trx_id in list(pending):
+            if hive_lookups and trx_id in unseen:
+                logger.warning("Transaction %s was not found in a block", trx_id)
+                for holder in pending.pop(trx_id):
+                    outcomes[holder.account] = "Unconfirmed"
+            else:
+                logger.warning("Transaction %s was not executed by Hive Engine in time", trx_id)
+
+        confirmed = sum(1 for outcome in outcomes.values() if outcome == "Confirmed")
+        logger.info(
+            "Confirmed %d of %d transfers", confirmed, sum(len(batch) for batch in sent.values())
+        )
+        return outcomes
+
+    def _send_batches(
+        self,
+        holders: List[TokenHolder],
+        writer: Any,
+        audit_file: IO[str]
+    ) -> Dict[str, List[TokenHolder]]:
+        """Sign and send payment batches in turn, throttled to a number of transactions per block.
+
+        Returns the batch paid by each transaction that was broadcast, by id.
+        """
+        # Transactions landing in the same block cost nothing extra, so allow a block's
+        # worth at once and refill at that rate per block interval
+        tx_per_block = self.config.tx_per_block
+        bucket = TokenBucket(tx_per_block, tx_per_block / HIVE_BLOCK_INTERVAL)
+        sent = {}
+        for batch in self._batches(holders):
+            # Signed only once the limiter lets it through, so no expiration time is spent waiting
+            bucket.acquire()
+            transaction = None
+            signed = self.sign_transaction(batch)
+            if signed is not None:
+                transaction = self.send_transaction(*signed)
+            # Records are streamed as each batch completes
+            self._write_audit(writer, batch, transaction)
+            audit_file.flush()
+            os.fsync(audit_file.fileno())
+            if transaction:
+                sent[transaction["trx_id"]] = batch
+        return sent
 
     def display_richlist(self, holders: List[TokenHolder]) -> None:
-        """Display richlist in a formatted table."""
+        """Display richlist in a formatted table, or a one-line summary when not interactive."""
+        if not sys.stdout.isatty():
+            total = sum(holder.payment for holder in holders)
+            logger.info(
+                "Processed %d holders, %s %s total",
+                len(holders), format_amount(total), self.config.token_name
+            )
+            return
+
         table = PrettyTable(["Account", "Holding", "Payment"])
         table.set_style(TableStyle.MARKDOWN)
         table.align["Account"] = "l"
         table.align["Holding"] = "r"
         table.align["Payment"] = "r"
 
-        for holder in holders:
-            payment_amount = holder.balance * self.config.payout_rate
-            table.add_row(
-                [holder.account, holder.balance, f"{payment_amount:0.4f}"]
-            )
+        table.add_rows([
+            [holder.account, holder.balance, format_amount(holder.payment)]
+            for holder in holders
+        ])
 
-        print(table.get_string(sortby="Holding", reversesort=True))
+        print(table)
 
 def main():
     """Main script execution function."""
     try:
         distributor = TokenDistributor()
-        richlist = distributor.get_richlist()
+        # The richlist does not depend on the Hive connection, so fetch both at once
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            richlist_future = executor.submit(distributor.get_richlist)
+            distributor.connect()
+            richlist = richlist_future.result()
         distributor.process_payments(richlist)
         distributor.display_richlist(richlist)
     except Exception as e:
-        logger.error(f"Script execution error: {e}")
+        logger.error("Script execution error: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":